@@ -12,15 +12,19 @@ CAESAR CIPHER CRACKER — ULTIMATE EDITION
   6. Адаптивные веса в зависимости от длины текста
 """
 
+import os
 import sys
 import re
 import math
+import heapq
 import argparse
 from pathlib import Path
-from typing import List, Tuple, Dict, Optional, Set
+from typing import List, Tuple, Dict, Optional, Set, FrozenSet
 from dataclasses import dataclass, field
 from functools import lru_cache
 from collections import Counter
+from itertools import accumulate, chain
+from concurrent.futures import ProcessPoolExecutor
 
 try:
     from rich.console import Console
@@ -113,6 +117,120 @@ EN_SUFFIXES = (
 )
 
 
+def _suffix_trie(suffixes: Tuple[str, ...]) -> dict:
+    """
+    Дерево перевёрнутых суффиксов: обход по reversed(word) за O(len(word))
+    находит самый длинный суффикс. Ключ '' в узле — длина суффикса.
+    """
+    root: dict = {}
+    for suffix in suffixes:
+        node = root
+        for ch in reversed(suffix):
+            node = node.setdefault(ch, {})
+        node[''] = len(suffix)
+    return root
+
+
+RU_SUFFIX_TRIE = _suffix_trie(RU_SUFFIXES)
+EN_SUFFIX_TRIE = _suffix_trie(EN_SUFFIXES)
+
+# Частоты в порядке алфавита: FREQ_ARR[i] — эталон для буквы ALPHA[i]
+RU_FREQ_ARR = tuple(RU_LETTER_FREQ.get(c, 0.0) for c in RU_ALPHA)
+EN_FREQ_ARR = tuple(EN_LETTER_FREQ.get(c, 0.0) for c in EN_ALPHA)
+
+
+def _inv_freq_rotations(freqs: Tuple[float, ...]) -> Tuple[Tuple[float, ...], ...]:
+    """rot[c][s] = 1 / E[(c - s) mod N] — куда попадает буква шифротекста c при сдвиге s"""
+    size = len(freqs)
+    return tuple(
+        tuple(1.0 / freqs[(c - s) % size] for s in range(size))
+        for c in range(size)
+    )
+
+
+# Все эталонные частоты > 0, поэтому chi² раскладывается без особых случаев
+RU_INV_FREQ_ROT = _inv_freq_rotations(RU_FREQ_ARR)
+EN_INV_FREQ_ROT = _inv_freq_rotations(EN_FREQ_ARR)
+RU_FREQ_SUM = sum(RU_FREQ_ARR)
+EN_FREQ_SUM = sum(EN_FREQ_ARR)
+
+
+def _index_lut(alpha: str) -> dict:
+    """Таблица для str.translate(): буква (любой регистр) → chr(индекс в алфавите)"""
+    lut = {ord(c): i for i, c in enumerate(alpha)}
+    lut.update({ord(c.upper()): i for i, c in enumerate(alpha)})
+    return lut
+
+
+RU_LUT = _index_lut(RU_ALPHA)
+EN_LUT = _index_lut(EN_ALPHA)
+
+# Разделитель слов в потоке индексов (вне диапазона индексов букв)
+_IDX_SEP = 0xFF
+
+
+def _shift_tables(size: int) -> Tuple[bytes, ...]:
+    """Таблицы для bytes.translate(): индекс i → (i - s) mod N, для каждого сдвига s"""
+    return tuple(
+        bytes((i - s) % size if i < size else i for i in range(256))
+        for s in range(size)
+    )
+
+
+RU_SHIFT_TABLES = _shift_tables(RU_SIZE)
+EN_SHIFT_TABLES = _shift_tables(EN_SIZE)
+
+# Обратная таблица: chr(индекс) → буква, разделитель → пробел
+RU_IDX_TO_ALPHA = {**dict(enumerate(RU_ALPHA)), _IDX_SEP: ' '}
+EN_IDX_TO_ALPHA = {**dict(enumerate(EN_ALPHA)), _IDX_SEP: ' '}
+
+
+def _bigram_mask(alpha: str, bigrams: frozenset) -> bytes:
+    """Плоская таблица N×N: mask[a * N + b] == 1, если биграмма (a, b) частая"""
+    size = len(alpha)
+    mask = bytearray(size * size)
+    for bg in bigrams:
+        mask[alpha.index(bg[0]) * size + alpha.index(bg[1])] = 1
+    return bytes(mask)
+
+
+RU_BIGRAM_MASK = _bigram_mask(RU_ALPHA, RU_COMMON_BIGRAMS)
+EN_BIGRAM_MASK = _bigram_mask(EN_ALPHA, EN_COMMON_BIGRAMS)
+
+
+def _shifted_bigram_masks(mask: bytes, size: int) -> Tuple[bytes, ...]:
+    """masks[s][a * N + b] — частая ли биграмма шифротекста (a, b) после дешифровки сдвигом s"""
+    return tuple(
+        bytes(
+            mask[((a - s) % size) * size + (b - s) % size]
+            for a in range(size) for b in range(size)
+        )
+        for s in range(size)
+    )
+
+
+RU_BIGRAM_MASKS = _shifted_bigram_masks(RU_BIGRAM_MASK, RU_SIZE)
+EN_BIGRAM_MASKS = _shifted_bigram_masks(EN_BIGRAM_MASK, EN_SIZE)
+
+# Столбцы тех же масок: BIGRAM_COLS[a * N + b][s] — вклад биграммы во все сдвиги
+RU_BIGRAM_COLS = tuple(zip(*RU_BIGRAM_MASKS))
+EN_BIGRAM_COLS = tuple(zip(*EN_BIGRAM_MASKS))
+
+_RU_NON_ALPHA_RE = re.compile(r'[^а-яёА-ЯЁ]+')
+_EN_NON_ALPHA_RE = re.compile(r'[^a-zA-Z]+')
+
+
+def _delete_table(alpha: str) -> bytes:
+    """Байты cp1251, не являющиеся буквами алфавита, — для bytes.translate(None, delete)"""
+    keep = set((alpha + alpha.upper()).encode('cp1251'))
+    return bytes(b for b in range(256) if b not in keep)
+
+
+# cp1251 вмещает и латиницу, и всю кириллицу (с ё) в один байт на символ
+RU_DELETE = _delete_table(RU_ALPHA)
+EN_DELETE = _delete_table(EN_ALPHA)
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # DATA CLASSES
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -154,8 +272,8 @@ _SCRIPT_DIR = Path(__file__).resolve().parent
 class Dictionary:
     """Синглтон-словарь с ленивой загрузкой (русский + английский)"""
     _inst = None
-    _ru_words: Optional[Set[str]] = None
-    _en_words: Optional[Set[str]] = None
+    _ru_words: Optional[FrozenSet[str]] = None
+    _en_words: Optional[FrozenSet[str]] = None
 
     def __new__(cls):
         if cls._inst is None:
@@ -163,18 +281,18 @@ class Dictionary:
         return cls._inst
 
     @property
-    def ru_words(self) -> Set[str]:
+    def ru_words(self) -> FrozenSet[str]:
         if self._ru_words is None:
             self._load_ru()
         return self._ru_words
 
     @property
-    def en_words(self) -> Set[str]:
+    def en_words(self) -> FrozenSet[str]:
         if self._en_words is None:
             self._load_en()
         return self._en_words
 
-    def words(self, lang: str) -> Set[str]:
+    def words(self, lang: str) -> FrozenSet[str]:
         return self.ru_words if lang == 'ru' else self.en_words
 
     @staticmethod
@@ -185,35 +303,38 @@ class Dictionary:
                 return p
         return None
 
-    def _load_file(self, path: Path) -> Set[str]:
+    def _load_file(self, path: Optional[Path], base: FrozenSet[str]) -> FrozenSet[str]:
+        """
+        Слова из файла + базовые — сразу в неизменяемый frozenset,
+        без промежуточного set и без копии всего словаря при слиянии.
+        """
+        if path is None:
+            return base
         try:
             with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                return {
-                    w.lower() for line in f
-                    if (w := line.strip()) and 2 <= len(w) <= 50 and w.isalpha()
-                }
+                return frozenset(chain(
+                    (w.lower() for line in f
+                     if (w := line.strip()) and 2 <= len(w) <= 50 and w.isalpha()),
+                    base,
+                ))
         except Exception:
-            return set()
+            return base
 
     def _load_ru(self):
-        p = self._find('russian_dict.txt')
-        self._ru_words = self._load_file(p) if p else set()
-        self._ru_words |= {
+        self._ru_words = self._load_file(self._find('russian_dict.txt'), frozenset({
             'и', 'в', 'не', 'на', 'он', 'что', 'как', 'а', 'то', 'все',
             'она', 'так', 'его', 'но', 'да', 'ты', 'же', 'вы', 'за', 'бы',
             'по', 'от', 'из', 'для', 'это', 'мы', 'они', 'был', 'быть',
-        }
+        }))
 
     def _load_en(self):
-        p = self._find('english_dict.txt')
-        self._en_words = self._load_file(p) if p else set()
-        self._en_words |= {
+        self._en_words = self._load_file(self._find('english_dict.txt'), frozenset({
             'the', 'be', 'to', 'of', 'and', 'in', 'that', 'have', 'it', 'for',
             'not', 'on', 'with', 'he', 'as', 'you', 'do', 'at', 'this', 'but',
             'his', 'by', 'from', 'they', 'we', 'say', 'her', 'she', 'or', 'an',
             'will', 'my', 'one', 'all', 'would', 'there', 'their', 'what', 'so',
             'if', 'about', 'who', 'get', 'which', 'go', 'when', 'can', 'no',
-        }
+        }))
 
     def __len__(self) -> int:
         return len(self.ru_words) + len(self.en_words)
@@ -227,7 +348,6 @@ class Decryptor:
     """Дешифровка через str.translate() — O(n), реализация на C"""
 
     @staticmethod
-    @lru_cache(maxsize=128)
     def _table(shift: int, lang: str) -> dict:
         alpha = RU_ALPHA if lang == 'ru' else EN_ALPHA
         size = len(alpha)
@@ -239,52 +359,158 @@ class Decryptor:
 
     @staticmethod
     def decrypt(text: str, shift: int, lang: str = 'ru') -> str:
-        return text.translate(Decryptor._table(shift, lang))
+        tables = RU_TABLES if lang == 'ru' else EN_TABLES
+        return text.translate(tables[shift % len(tables)])
+
+
+# Все таблицы замены крошечные (33 + 26) — строим сразу при импорте
+RU_TABLES = tuple(Decryptor._table(s, 'ru') for s in range(RU_SIZE))
+EN_TABLES = tuple(Decryptor._table(s, 'en') for s in range(EN_SIZE))
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # СКОРЕРЫ (многоуровневая система оценки)
 # ═══════════════════════════════════════════════════════════════════════════════
 
+def text_to_idx(text: str, lang: str = 'ru') -> bytes:
+    """
+    Текст → bytes индексов букв в алфавите (не-буквы выброшены).
+    Оба прохода (re.sub + str.translate) — на уровне C.
+    """
+    if lang == 'ru':
+        non_alpha, lut = _RU_NON_ALPHA_RE, RU_LUT
+    else:
+        non_alpha, lut = _EN_NON_ALPHA_RE, EN_LUT
+    return non_alpha.sub('', text).translate(lut).encode('latin-1')
+
+
+@lru_cache(maxsize=4096)
+def letter_counts(text: str) -> Tuple[int, int]:
+    """
+    (русских букв, английских букв) в тексте.
+    Текст кодируется в cp1251 один раз (прочие символы отбрасываются),
+    дальше каждый язык — bytes.translate с 256-байтной таблицей удаления.
+    """
+    raw = text.encode('cp1251', 'ignore')
+    return len(raw.translate(None, RU_DELETE)), len(raw.translate(None, EN_DELETE))
+
+
+def _bincount(idx: bytes, size: int) -> List[int]:
+    """Гистограмма индексов: counts[i] — сколько раз встретилась буква i"""
+    return [idx.count(i) for i in range(size)]
+
+
+def _idx_stats(idx: bytes, size: int) -> Tuple[List[int], Counter]:
+    """Гистограмма букв и счётчик биграмм (ключ a * N + b) по индексам"""
+    bigrams = Counter(a * size + b for a, b in zip(idx, idx[1:]))
+    return _bincount(idx, size), bigrams
+
+
+@lru_cache(maxsize=1024)
+def _letter_stats(text: str, lang: str = 'ru') -> Tuple[bytes, List[int], Counter]:
+    """
+    Один проход по тексту для всех статистических скореров:
+    (индексы букв, гистограмма букв, счётчик биграмм по ключу a * N + b).
+    """
+    size = RU_SIZE if lang == 'ru' else EN_SIZE
+    idx = text_to_idx(text, lang)
+    return (idx, *_idx_stats(idx, size))
+
+
+def _chi_from_counts(observed: List[int], n: int, freqs: Tuple[float, ...]) -> float:
+    """Chi-squared по готовой гистограмме из n букв"""
+    chi_sq = 0.0
+    for actual, expected_freq in zip(observed, freqs):
+        expected = expected_freq * n
+        if expected > 0:
+            chi_sq += (actual - expected) ** 2 / expected
+    return chi_sq
+
+
+def _ic_from_counts(hist: List[int], n: int) -> float:
+    """Index of Coincidence по готовой гистограмме из n букв"""
+    if n < 2:
+        return 0.0
+    return sum(f * (f - 1) for f in hist) / (n * (n - 1))
+
+
+def _chi_all_shifts(
+    hist: List[int], n: int, inv_rot: Tuple[Tuple[float, ...], ...], freq_sum: float
+) -> List[float]:
+    """
+    Chi-squared для всех сдвигов по гистограмме шифротекста.
+    Σ (D - nE)² / nE = Σ D² / nE - 2n + n·ΣE, а D при сдвиге s — поворот
+    гистограммы, поэтому каждая встреченная буква c добавляет h_c² · rot[c]
+    сразу ко всем сдвигам: O(k·N) для k различных букв вместо O(N²).
+    """
+    size = len(inv_rot)
+    if n == 0:
+        return [float('inf')] * size
+
+    acc = [0.0] * size
+    for c, h in enumerate(hist):
+        if h:
+            w = h * h
+            acc = [a + w * r for a, r in zip(acc, inv_rot[c])]
+
+    base = n * freq_sum - 2 * n
+    return [a / n + base for a in acc]
+
+
+def _bigram_all_shifts(bigrams: Counter, n: int, masks: Tuple[bytes, ...]) -> List[float]:
+    """Доля частых биграмм для всех сдвигов по счётчику биграмм шифротекста из n букв"""
+    if n < 4:
+        return [0.0] * len(masks)
+    total = n - 1
+    items = tuple(bigrams.items())
+    return [sum(count for packed, count in items if mask[packed]) / total for mask in masks]
+
+
 def chi_squared(text: str, lang: str = 'ru') -> float:
     """
     Chi-squared тест: сравнение частоты букв с эталоном.
     Меньше = лучше.
     """
-    charset = RU_SET if lang == 'ru' else EN_SET
-    freqs = RU_LETTER_FREQ if lang == 'ru' else EN_LETTER_FREQ
+    freqs = RU_FREQ_ARR if lang == 'ru' else EN_FREQ_ARR
 
-    letters = [c for c in text.lower() if c in charset]
-    n = len(letters)
+    idx, hist, _ = _letter_stats(text, lang)
+    n = len(idx)
     if n == 0:
         return float('inf')
 
-    observed = Counter(letters)
-    chi_sq = 0.0
-    for char, expected_freq in freqs.items():
-        expected = expected_freq * n
-        actual = observed.get(char, 0)
-        if expected > 0:
-            chi_sq += (actual - expected) ** 2 / expected
+    return _chi_from_counts(hist, n, freqs)
 
-    return chi_sq
+
+def score_all_shifts_chi(text: str, lang: str = 'ru') -> List[float]:
+    """Chi-squared для всех сдвигов по одной гистограмме шифротекста: O(n + N²)"""
+    if lang == 'ru':
+        inv_rot, freq_sum = RU_INV_FREQ_ROT, RU_FREQ_SUM
+    else:
+        inv_rot, freq_sum = EN_INV_FREQ_ROT, EN_FREQ_SUM
+    idx, hist, _ = _letter_stats(text, lang)
+    return _chi_all_shifts(hist, len(idx), inv_rot, freq_sum)
 
 
 def bigram_score(text: str, lang: str = 'ru') -> float:
     """Оценка по биграммам."""
-    charset = RU_SET if lang == 'ru' else EN_SET
-    common = RU_COMMON_BIGRAMS if lang == 'ru' else EN_COMMON_BIGRAMS
+    mask = RU_BIGRAM_MASK if lang == 'ru' else EN_BIGRAM_MASK
 
-    letters = [c for c in text.lower() if c in charset]
-    if len(letters) < 4:
+    idx, _, bigrams = _letter_stats(text, lang)
+    if len(idx) < 4:
         return 0.0
 
-    bigrams = [letters[i] + letters[i+1] for i in range(len(letters) - 1)]
-    if not bigrams:
-        return 0.0
+    hits = sum(count for packed, count in bigrams.items() if mask[packed])
+    return hits / (len(idx) - 1)
+
 
-    hits = sum(1 for bg in bigrams if bg in common)
-    return hits / len(bigrams)
+def score_all_shifts_bigram(text: str, lang: str = 'ru') -> List[float]:
+    """
+    bigram_score для всех сдвигов по биграммам шифротекста — без дешифровки:
+    сдвиг меняет только то, какие пары (a, b) считаются частыми.
+    """
+    masks = RU_BIGRAM_MASKS if lang == 'ru' else EN_BIGRAM_MASKS
+    idx, _, bigrams = _letter_stats(text, lang)
+    return _bigram_all_shifts(bigrams, len(idx), masks)
 
 
 def index_of_coincidence(text: str, lang: str = 'ru') -> float:
@@ -292,28 +518,28 @@ def index_of_coincidence(text: str, lang: str = 'ru') -> float:
     Index of Coincidence.
     RU ≈ 0.0553, EN ≈ 0.0667, random_ru ≈ 0.0303, random_en ≈ 0.0385
     """
-    charset = RU_SET if lang == 'ru' else EN_SET
-
-    letters = [c for c in text.lower() if c in charset]
-    n = len(letters)
-    if n < 2:
-        return 0.0
-
-    freq = Counter(letters)
-    ic = sum(f * (f - 1) for f in freq.values()) / (n * (n - 1))
-    return ic
+    idx, hist, _ = _letter_stats(text, lang)
+    return _ic_from_counts(hist, len(idx))
 
 
+@lru_cache(maxsize=200_000)
 def stem_word(word: str, lang: str = 'ru') -> str:
-    """Лёгкий стемминг: отрезает суффиксы."""
-    suffixes = RU_SUFFIXES if lang == 'ru' else EN_SUFFIXES
+    """Лёгкий стемминг: отрезает самый длинный суффикс."""
+    node = RU_SUFFIX_TRIE if lang == 'ru' else EN_SUFFIX_TRIE
     min_base = 2 if lang == 'en' else 3  # Англ. основы короче
-    for suffix in suffixes:
-        if len(word) > len(suffix) + min_base and word.endswith(suffix):
-            return word[:-len(suffix)]
-    return word
-
-
+    max_len = len(word) - min_base - 1   # основа должна остаться длиннее min_base
+    best = 0
+    for depth, ch in enumerate(reversed(word), 1):
+        if depth > max_len:
+            break
+        node = node.get(ch)
+        if node is None:
+            break
+        best = node.get('', best)
+    return word[:-best] if best else word
+
+
+@lru_cache(maxsize=65_536)
 def normalize_yo(text: str) -> str:
     """Нормализация ё→е для устойчивости к вариативному написанию"""
     return text.replace('ё', 'е').replace('Ё', 'Е')
@@ -323,14 +549,39 @@ def normalize_yo(text: str) -> str:
 # СЛОВАРНЫЙ АНАЛИЗ
 # ═══════════════════════════════════════════════════════════════════════════════
 
-_RU_WORD_RE = re.compile(r'[а-яёА-ЯЁ]{2,}')
-_EN_WORD_RE = re.compile(r'[a-zA-Z]{2,}')
+def extract_words(text: str, lang: str = 'ru') -> Tuple[str, ...]:
+    """Извлекает слова (≥2 букв, в нижнем регистре) из текста"""
+    return _shift_words(_tokenize_cached(text, lang), 0, lang)
 
 
-def extract_words(text: str, lang: str = 'ru') -> Tuple[str, ...]:
-    """Извлекает слова из текста"""
-    pattern = _RU_WORD_RE if lang == 'ru' else _EN_WORD_RE
-    return tuple(w.lower() for w in pattern.findall(text))
+@lru_cache(maxsize=256)
+def _tokenize_cached(text: str, lang: str = 'ru') -> bytes:
+    """
+    Слова текста как индексы алфавита, склеенные через _IDX_SEP.
+    Дешифровка — биекция букв, границы слов от сдвига не зависят:
+    токенизируем шифротекст один раз, дальше сдвигаем только индексы.
+
+    Слова — это серии букв: каждая серия не-букв схлопывается в разделитель,
+    буквы переводятся в индексы (без .lower() на каждое слово),
+    серии короче 2 букв отбрасываются.
+    """
+    if lang == 'ru':
+        non_alpha, lut = _RU_NON_ALPHA_RE, RU_LUT
+    else:
+        non_alpha, lut = _EN_NON_ALPHA_RE, EN_LUT
+    sep = bytes((_IDX_SEP,))
+    runs = non_alpha.sub(chr(_IDX_SEP), text).translate(lut).encode('latin-1').split(sep)
+    return sep.join(r for r in runs if len(r) >= 2)
+
+
+def _shift_words(words_idx: bytes, shift: int, lang: str = 'ru') -> Tuple[str, ...]:
+    """Слова после дешифровки сдвигом shift — без повторного regex-прохода"""
+    if not words_idx:
+        return ()
+    tables = RU_SHIFT_TABLES if lang == 'ru' else EN_SHIFT_TABLES
+    to_alpha = RU_IDX_TO_ALPHA if lang == 'ru' else EN_IDX_TO_ALPHA
+    shifted = words_idx.translate(tables[shift]).decode('latin-1')
+    return tuple(shifted.translate(to_alpha).split(' '))
 
 
 def dict_score(text: str, dictionary: Set[str], lang: str = 'ru') -> Tuple[float, int, int]:
@@ -340,50 +591,94 @@ def dict_score(text: str, dictionary: Set[str], lang: str = 'ru') -> Tuple[float
     2. Без ё (е вместо ё) [только RU]
     3. Стемминг + поиск
     """
-    words = extract_words(text, lang)
-    if not words:
-        return 0.0, 0, 0
+    return _dict_score_words(extract_words(text, lang), dictionary, lang)
 
-    matches = 0
-    match_weight = 0
-    total_weight = 0
 
-    for word in words:
-        wlen = len(word)
-        total_weight += wlen
+@lru_cache(maxsize=200_000)
+def _word_forms(word: str, lang: str = 'ru') -> Tuple[str, str, str]:
+    """
+    Формы слова для поиска в словаре: (без ё, основа, основа без ё).
+    Считаются один раз и общие для dict_score и stem_dict_score;
+    для EN формы «без ё» совпадают с исходными.
+    """
+    no_yo = normalize_yo(word) if lang == 'ru' else word
+    stem = stem_word(word, lang)
+    stem_no_yo = stem_word(no_yo, lang) if no_yo != word else stem
+    return no_yo, stem, stem_no_yo
 
-        # 1. Точное совпадение
-        if word in dictionary:
-            matches += 1
-            match_weight += wlen
-            continue
 
-        # 2. Замена ё→е (только RU)
-        if lang == 'ru':
-            word_no_yo = normalize_yo(word)
-            if word_no_yo != word and word_no_yo in dictionary:
-                matches += 1
-                match_weight += wlen
-                continue
-        else:
-            word_no_yo = word
+def _word_weight(word: str, dictionary: Set[str], lang: str = 'ru') -> float:
+    """
+    Вклад слова в dict_score (доля от его длины):
+    1.0 — точно / без ё, 0.8 — по основе, 0.7 — основа без ё, 0.0 — не найдено.
+    """
+    # 1. Точное совпадение
+    if word in dictionary:
+        return 1.0
+
+    no_yo, stem, stem_no_yo = _word_forms(word, lang)
+
+    # 2. Замена ё→е (только RU: для EN no_yo == word)
+    if no_yo != word and no_yo in dictionary:
+        return 1.0
+
+    # 3. Стемминг
+    if stem != word and stem in dictionary:
+        return 0.8
+
+    # 4. Стемминг + нормализация (без ё основа совпадает с уже проверенной)
+    if stem_no_yo != no_yo and stem_no_yo in dictionary:
+        return 0.7
+
+    return 0.0
+
+
+def _stem_hit(word: str, dictionary: Set[str], lang: str = 'ru') -> bool:
+    """Находится ли корень слова прогрессивной обрезкой основы"""
+    min_stem = 2 if lang == 'en' else 3
+    candidate = _word_forms(word, lang)[2]
+    while len(candidate) >= min_stem:
+        if candidate in dictionary:
+            return True
+        candidate = candidate[:-1]
+    return False
+
+
+def _is_shared_dictionary(dictionary: Set[str], lang: str) -> bool:
+    """dictionary — уже загруженный словарь синглтона (результаты можно кэшировать)"""
+    d = Dictionary()
+    return dictionary is (d._ru_words if lang == 'ru' else d._en_words)
+
+
+@lru_cache(maxsize=200_000)
+def _word_lookup(word: str, lang: str = 'ru') -> float:
+    """_word_weight по словарю синглтона, один раз на уникальное слово"""
+    return _word_weight(word, Dictionary().words(lang), lang)
+
+
+@lru_cache(maxsize=200_000)
+def _stem_lookup(word: str, lang: str = 'ru') -> bool:
+    """_stem_hit по словарю синглтона, один раз на уникальное слово"""
+    return _stem_hit(word, Dictionary().words(lang), lang)
 
-        # 3. Стемминг
-        stem = stem_word(word, lang)
-        if stem != word and stem in dictionary:
-            matches += 1
-            match_weight += wlen * 0.8
-            continue
 
-        # 4. Стемминг + нормализация
-        if lang == 'ru':
-            stem_no_yo = stem_word(word_no_yo, lang)
-            if stem_no_yo != word_no_yo and stem_no_yo in dictionary:
-                matches += 1
-                match_weight += wlen * 0.7
-                continue
+def _dict_score_words(
+    words: Tuple[str, ...], dictionary: Set[str], lang: str = 'ru'
+) -> Tuple[float, int, int]:
+    """dict_score по уже извлечённым словам"""
+    if not words:
+        return 0.0, 0, 0
+
+    if _is_shared_dictionary(dictionary, lang):
+        weights = [_word_lookup(word, lang) for word in words]
+    else:
+        weights = [_word_weight(word, dictionary, lang) for word in words]
+
+    matches = sum(1 for w in weights if w > 0)
+    match_weight = sum(len(word) * w for word, w in zip(words, weights))
+    total_weight = sum(len(word) for word in words)
 
-    ratio = matches / len(words) if words else 0.0
+    ratio = matches / len(words)
     weighted = match_weight / total_weight if total_weight > 0 else 0.0
 
     return ratio * 0.5 + weighted * 0.5, matches, len(words)
@@ -391,22 +686,22 @@ def dict_score(text: str, dictionary: Set[str], lang: str = 'ru') -> Tuple[float
 
 def stem_dict_score(text: str, dictionary: Set[str], lang: str = 'ru') -> float:
     """Агрессивный стемминг: обрезаем до нахождения корня."""
-    words = extract_words(text, lang)
+    return _stem_dict_score_words(extract_words(text, lang), dictionary, lang)
+
+
+def _stem_dict_score_words(
+    words: Tuple[str, ...], dictionary: Set[str], lang: str = 'ru'
+) -> float:
+    """stem_dict_score по уже извлечённым словам"""
     if not words:
         return 0.0
 
-    min_stem = 2 if lang == 'en' else 3
-    hits = 0
-    for word in words:
-        stem = stem_word(normalize_yo(word) if lang == 'ru' else word, lang)
-        candidate = stem
-        while len(candidate) >= min_stem:
-            if candidate in dictionary:
-                hits += 1
-                break
-            candidate = candidate[:-1]
+    if _is_shared_dictionary(dictionary, lang):
+        hits = sum(1 for word in words if _stem_lookup(word, lang))
+    else:
+        hits = sum(1 for word in words if _stem_hit(word, dictionary, lang))
 
-    return hits / len(words) if words else 0.0
+    return hits / len(words)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -435,14 +730,12 @@ class Analyzer:
 
     def detect_language(self, text: str) -> str:
         """Определяет язык текста"""
-        ru = sum(1 for c in text.lower() if c in RU_SET)
-        en = sum(1 for c in text.lower() if c in EN_SET)
+        ru, en = letter_counts(text)
         return 'ru' if ru > en else 'en'
 
     def is_bilingual(self, text: str) -> bool:
         """Есть ли в тексте оба языка (значимо)"""
-        ru = sum(1 for c in text.lower() if c in RU_SET)
-        en = sum(1 for c in text.lower() if c in EN_SET)
+        ru, en = letter_counts(text)
         total = ru + en
         if total == 0:
             return False
@@ -450,25 +743,35 @@ class Analyzer:
         return minor / total > 0.05  # >5% минорного языка
 
     def _letter_count(self, text: str, lang: str = 'ru') -> int:
-        charset = RU_SET if lang == 'ru' else EN_SET
-        return sum(1 for c in text if c.lower() in charset)
+        delete = RU_DELETE if lang == 'ru' else EN_DELETE
+        return len(text.encode('cp1251', 'ignore').translate(None, delete))
 
-    def analyze_shift(self, text: str, shift: int, lang: str = 'ru') -> ShiftResult:
-        """Полный анализ одного варианта сдвига"""
+    def analyze_shift(
+        self, text: str, shift: int, lang: str = 'ru',
+        chi: Optional[float] = None, bg: Optional[float] = None,
+    ) -> ShiftResult:
+        """
+        Полный анализ одного варианта сдвига.
+        chi и bg можно передать заранее (см. score_all_shifts_chi / _bigram):
+        тогда статистика по расшифровке не пересчитывается.
+        """
         decrypted = Decryptor.decrypt(text, shift, lang)
         dictionary = self.dict.words(lang)
 
         # 1. Chi-squared
-        chi = chi_squared(decrypted, lang)
+        if chi is None:
+            chi = chi_squared(decrypted, lang)
 
         # 2. Биграммы
-        bg = bigram_score(decrypted, lang)
+        if bg is None:
+            bg = bigram_score(decrypted, lang)
 
-        # 3. Словарь
-        ds, matches, total = dict_score(decrypted, dictionary, lang)
+        # 3. Словарь (слова берём из кэша токенизации шифротекста)
+        words = _shift_words(_tokenize_cached(text, lang), shift, lang)
+        ds, matches, total = _dict_score_words(words, dictionary, lang)
 
         # 4. Стемминг
-        ss = stem_dict_score(decrypted, dictionary, lang)
+        ss = _stem_dict_score_words(words, dictionary, lang)
 
         # 5. Адаптивная комбинация
         letter_count = self._letter_count(text, lang)
@@ -512,17 +815,76 @@ class Analyzer:
 
         return w_chi * chi_norm + w_bg * bg + w_dict * ds + w_stem * ss
 
-    def crack(self, text: str, lang: str = None) -> List[ShiftResult]:
-        """Перебирает все сдвиги, возвращает отсортированный список"""
+    def crack(
+        self, text: str, lang: str = None, top_k: Optional[int] = 5
+    ) -> List[ShiftResult]:
+        """
+        Перебирает сдвиги, возвращает top_k лучших (по убыванию combined;
+        top_k=None — все). Повторный вызов с тем же текстом берётся из кэша.
+        """
         if lang is None:
             lang = self.detect_language(text)
-        alpha_size = RU_SIZE if lang == 'ru' else EN_SIZE
-        results = [self.analyze_shift(text, s, lang) for s in range(alpha_size)]
-        results.sort(key=lambda r: r.combined, reverse=True)
-        return results
+        return list(_crack_cached(text, lang, top_k))
+
+    def _crack(self, text: str, lang: str, top_k: Optional[int]) -> List[ShiftResult]:
+        """
+        Реализация crack без кэша. Скоры копятся в параллельных списках;
+        расшифровка и ShiftResult создаются только для попавших в top_k.
+
+        Branch-and-bound: chi² и биграммы дёшевы и считаются для всех сдвигов,
+        а словарь и стемминг — в порядке убывания верхней оценки
+        (ds = ss = 1), пока оставшиеся сдвиги ещё могут попасть в top_k.
+        """
+        dictionary = self.dict.words(lang)
+        n_letters = self._letter_count(text, lang)
+        words_idx = _tokenize_cached(text, lang)
+
+        chi = score_all_shifts_chi(text, lang)
+        bg = score_all_shifts_bigram(text, lang)
+        size = len(chi)
+        bound = [self._combine(c, b, 1.0, 1.0, n_letters) for c, b in zip(chi, bg)]
+
+        ds, ss, combined = [0.0] * size, [0.0] * size, [0.0] * size
+        matches, total = [0] * size, [0] * size
+        scored: List[int] = []
+        best_k: List[float] = []  # min-куча из top_k лучших combined
+        for s in sorted(range(size), key=bound.__getitem__, reverse=True):
+            if top_k and len(best_k) == top_k and best_k[0] > bound[s]:
+                break  # даже идеальный словарный скор не поднимет оставшиеся в top_k
+            words = _shift_words(words_idx, s, lang)
+            ds[s], matches[s], total[s] = _dict_score_words(words, dictionary, lang)
+            ss[s] = _stem_dict_score_words(words, dictionary, lang)
+            combined[s] = self._combine(chi[s], bg[s], ds[s], ss[s], n_letters)
+            scored.append(s)
+            if top_k:
+                if len(best_k) < top_k:
+                    heapq.heappush(best_k, combined[s])
+                else:
+                    heapq.heappushpop(best_k, combined[s])
+
+        top = sorted(sorted(scored), key=combined.__getitem__, reverse=True)[:top_k]
+
+        return [
+            ShiftResult(
+                shift=s,
+                text=Decryptor.decrypt(text, s, lang),
+                chi_sq=chi[s],
+                bigram_score=bg[s],
+                dict_score=ds[s],
+                stem_score=ss[s],
+                combined=combined[s],
+                matches=matches[s],
+                total_words=total[s],
+            )
+            for s in top
+        ]
 
     def is_already_plaintext(self, text: str) -> bool:
         """Проверяет, не является ли текст уже открытым"""
+        return _plaintext_cached(text)
+
+    def _is_already_plaintext(self, text: str) -> bool:
+        """Реализация is_already_plaintext без кэша"""
         lang = self.detect_language(text)
         dictionary = self.dict.words(lang)
         ds, matches, total = dict_score(text, dictionary, lang)
@@ -538,6 +900,20 @@ class Analyzer:
         return False
 
 
+# Результаты зависят только от (текст, язык): словарь — синглтон,
+# ShiftResult неизменяемы. Повторы — одинаковые сегменты MixedDetector,
+# повторный ввод того же текста — отдаются из кэша.
+
+@lru_cache(maxsize=4096)
+def _crack_cached(text: str, lang: str, top_k: Optional[int]) -> Tuple[ShiftResult, ...]:
+    return tuple(Analyzer()._crack(text, lang, top_k))
+
+
+@lru_cache(maxsize=4096)
+def _plaintext_cached(text: str) -> bool:
+    return Analyzer()._is_already_plaintext(text)
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # РАЗБИЕНИЕ ПО ЯЗЫКАМ
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -565,10 +941,10 @@ def split_by_language(text: str) -> List[LangSegment]:
     cur_start = 0
 
     for i, ch in enumerate(text):
-        cl = ch.lower()
-        if cl in RU_SET:
+        code = ord(ch)
+        if code in RU_LUT:
             det = 'ru'
-        elif cl in EN_SET:
+        elif code in EN_LUT:
             det = 'en'
         else:
             continue  # нейтральный символ
@@ -609,6 +985,67 @@ def split_by_language(text: str) -> List[LangSegment]:
 # ДЕТЕКТОР СМЕШАННЫХ ШИФРОВ
 # ═══════════════════════════════════════════════════════════════════════════════
 
+def _window_shifts(
+    text: str, lang: str, window_size: int, first: int, last: int
+) -> List[Optional[int]]:
+    """
+    Лучший ключ окна для каждой позиции text[first:last] (None — не буква).
+    Окно позиции i — text[i - w/2 : i + w/2]. Окно скользит по индексам букв:
+    гистограмма и попадания биграмм по всем сдвигам обновляются
+    на входящую/уходящую букву за O(N), без пересчёта окна с нуля.
+    Функция модульная, чтобы её можно было отдать в пул процессов.
+    """
+    if lang == 'ru':
+        lut, cols, alpha_size = RU_LUT, RU_BIGRAM_COLS, RU_SIZE
+        inv_rot, freq_sum = RU_INV_FREQ_ROT, RU_FREQ_SUM
+    else:
+        lut, cols, alpha_size = EN_LUT, EN_BIGRAM_COLS, EN_SIZE
+        inv_rot, freq_sum = EN_INV_FREQ_ROT, EN_FREQ_SUM
+    n = len(text)
+    half_w = window_size // 2
+
+    idx = text_to_idx(text, lang)
+    is_letter = [ord(ch) in lut for ch in text]
+    before = [0, *accumulate(is_letter)]  # before[i] — букв в text[:i]
+
+    # Текущее окно — idx[lo:hi]; hits[s] — частых биграмм в нём при сдвиге s
+    hist = [0] * alpha_size
+    hits = [0] * alpha_size
+    lo = hi = before[max(0, first - half_w)]
+
+    best: List[Optional[int]] = []
+    for i in range(first, last):
+        if not is_letter[i]:
+            best.append(None)
+            continue
+
+        new_lo = before[max(0, i - half_w)]
+        new_hi = before[min(n, i + half_w)]
+        while hi < new_hi:
+            c = idx[hi]
+            hist[c] += 1
+            if hi > lo:
+                hits = [h + x for h, x in zip(hits, cols[idx[hi - 1] * alpha_size + c])]
+            hi += 1
+        while lo < new_lo:
+            c = idx[lo]
+            hist[c] -= 1
+            if lo + 1 < hi:
+                hits = [h - x for h, x in zip(hits, cols[c * alpha_size + idx[lo + 1]])]
+            lo += 1
+
+        m = hi - lo
+        chi_all = _chi_all_shifts(hist, m, inv_rot, freq_sum)
+        bg_all = [h / (m - 1) for h in hits] if m >= 4 else [0.0] * alpha_size
+        scores = [
+            bg * 0.6 + max(0, 1 - chi / 500) * 0.4
+            for chi, bg in zip(chi_all, bg_all)
+        ]
+        best.append(max(range(alpha_size), key=scores.__getitem__))
+
+    return best
+
+
 class MixedDetector:
     """
     Скользящее окно для обнаружения границ смены ключа.
@@ -626,17 +1063,15 @@ class MixedDetector:
     def __init__(self):
         self.analyzer = Analyzer()
         self.window_size = 40  # Символов в окне
+        self.parallel_min_chars = 200_000  # С этой длины карта сдвигов считается в пуле процессов
 
     def detect(self, text: str) -> List[Segment]:
         """Определяет сегменты с разными ключами"""
         lang = self.analyzer.detect_language(text)
-        charset = RU_SET if lang == 'ru' else EN_SET
-        letters_only = [c for c in text if c.lower() in charset]
-        n = len(letters_only)
+        n = self.analyzer._letter_count(text, lang)
 
         if n < self.window_size * 2:
-            results = self.analyzer.crack(text, lang)
-            best = results[0]
+            best = self.analyzer.crack(text, lang, top_k=1)[0]
             return [Segment(text=best.text, start=0, end=len(text), best_result=best)]
 
         shift_map = self._compute_shift_map(text, lang)
@@ -645,8 +1080,7 @@ class MixedDetector:
         segments = []
         for start, end in boundaries:
             segment_text = text[start:end]
-            results = self.analyzer.crack(segment_text, lang)
-            best = results[0]
+            best = self.analyzer.crack(segment_text, lang, top_k=1)[0]
             segments.append(Segment(
                 text=best.text, start=start, end=end, best_result=best
             ))
@@ -654,37 +1088,36 @@ class MixedDetector:
         return segments
 
     def _compute_shift_map(self, text: str, lang: str = 'ru') -> List[int]:
-        """Для каждого символа определяет оптимальный ключ через окно"""
-        charset = RU_SET if lang == 'ru' else EN_SET
-        alpha_size = RU_SIZE if lang == 'ru' else EN_SIZE
+        """
+        Для каждого символа определяет оптимальный ключ через окно.
+        Длинные тексты режутся на куски по числу ядер и считаются
+        в пуле процессов (окна независимы, счётчики целые — результат тот же).
+        """
         n = len(text)
-        shift_map = []
+        workers = os.cpu_count() or 1
         half_w = self.window_size // 2
 
-        for i in range(n):
-            if text[i].lower() not in charset:
-                shift_map.append(shift_map[-1] if shift_map else 0)
-                continue
-
-            start = max(0, i - half_w)
-            end = min(n, i + half_w)
-            window = text[start:end]
-
-            best_shift = 0
-            best_score = -1.0
-
-            for s in range(alpha_size):
-                dec = Decryptor.decrypt(window, s, lang)
-                chi = chi_squared(dec, lang)
-                bg = bigram_score(dec, lang)
-                score = bg * 0.6 + max(0, 1 - chi / 500) * 0.4
-
-                if score > best_score:
-                    best_score = score
-                    best_shift = s
-
-            shift_map.append(best_shift)
-
+        best = None
+        if n >= self.parallel_min_chars and workers > 1:
+            step = -(-n // workers)
+            jobs = []
+            for first in range(0, n, step):
+                last = min(n, first + step)
+                lo, hi = max(0, first - half_w), min(n, last + half_w)
+                jobs.append((text[lo:hi], lang, self.window_size, first - lo, last - lo))
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = [pool.submit(_window_shifts, *job) for job in jobs]
+                    best = [s for f in futures for s in f.result()]
+            except (OSError, RuntimeError):
+                best = None  # Нет пула процессов (песочница и т.п.) — считаем сами
+        if best is None:
+            best = _window_shifts(text, lang, self.window_size, 0, n)
+
+        # Не-буквы наследуют ключ предыдущей позиции
+        shift_map = []
+        for s in best:
+            shift_map.append(s if s is not None else (shift_map[-1] if shift_map else 0))
         return shift_map
 
     def _find_boundaries(
@@ -698,14 +1131,28 @@ class MixedDetector:
         if n == 0:
             return [(0, len(text))]
 
-        # Сглаживание: для каждой позиции берём моду окрестности
+        # Сглаживание: для каждой позиции берём моду окрестности.
+        # Счётчики сдвигов скользят вместе с окном (+1 вошедший, −1 ушедший);
+        # при равенстве побеждает сдвиг, раньше встретившийся в окрестности
         smooth_window = 15
+        half = smooth_window // 2
+        counts = [0] * (max(shift_map) + 1)
+        lo = hi = 0
         smoothed = []
         for i in range(n):
-            start = max(0, i - smooth_window // 2)
-            end = min(n, i + smooth_window // 2 + 1)
-            neighborhood = shift_map[start:end]
-            mode = Counter(neighborhood).most_common(1)[0][0]
+            start = max(0, i - half)
+            end = min(n, i + half + 1)
+            while hi < end:
+                counts[shift_map[hi]] += 1
+                hi += 1
+            while lo < start:
+                counts[shift_map[lo]] -= 1
+                lo += 1
+            top = max(counts)
+            if counts.count(top) == 1:
+                mode = counts.index(top)
+            else:
+                mode = next(v for v in shift_map[start:end] if counts[v] == top)
             smoothed.append(mode)
 
         # Находим точки смены
@@ -1005,8 +1452,7 @@ def _crack_bilingual(text, analyzer, detector, args, raw, ui):
     parts = []
 
     for lseg in lang_segments:
-        results = analyzer.crack(lseg.text, lseg.lang)
-        best = results[0]
+        best = analyzer.crack(lseg.text, lseg.lang, top_k=1)[0]
         parts.append((lseg, best))
 
     full_text = ''.join(best.text for _, best in parts)
@@ -1043,8 +1489,7 @@ def _crack_bilingual(text, analyzer, detector, args, raw, ui):
 def _crack_single_lang(text, lang, analyzer, detector, args, raw, ui, auto=True):
     """Дешифровка одноязычного текста"""
     if raw:
-        results = analyzer.crack(text, lang)
-        best = results[0]
+        best = analyzer.crack(text, lang, top_k=1)[0]
         if best.confidence < 60 and len(text) > 60:
             segments = detector.detect(text)
             keys = set(s.best_result.shift for s in segments)